@@ -1,7 +1,8 @@
 // main.ts
 import "dotenv/config";
-import { Client } from "pg";
-import { DateTime } from "luxon";
+import { Client, Pool, PoolClient } from "pg";
+import { DateTime, IANAZone } from "luxon";
+import { performance } from "perf_hooks";
 
 // Vehicle data type from API
 interface Vehicle {
@@ -16,152 +17,577 @@ interface Vehicle {
   wheelchair_accessible: string;
 }
 
-// Environment variable validation
-const requiredEnvVars = [
-  "DB_HOST",
-  "DB_PORT",
-  "DB_USER",
-  "DB_PASSWORD",
-  "DB_NAME",
-  "TRANZY_API_URL",
-  "TRANZY_API_KEY",
-];
+// Column-oriented batch of vehicle_state rows, passed straight to unnest()
+interface VehicleStateColumns {
+  vehicle_id: string[];
+  latitude: number[];
+  longitude: number[];
+  timestamp: Date[];
+  speed: number[];
+  bike_accessible: boolean[];
+  wheelchair_accessible: boolean[];
+}
+
+// Sync tuning options read from the environment
+interface SyncOptions {
+  // Maximum number of rows written per INSERT statement
+  readonly batchSize: number;
+  // When enabled, only store a vehicle state if it is newer than the latest stored state for that vehicle
+  readonly incremental: boolean;
+  // When enabled, commits do not wait for the WAL flush (synchronous_commit = off). Faster writes,
+  // but a database crash can lose the last few hundred milliseconds of committed runs.
+  readonly aggressiveBulkMode: boolean;
+}
+
+// Connection and sync settings read from the environment
+interface Config {
+  db: {
+    host: string;
+    port: number;
+    user: string;
+    password: string;
+    database: string;
+  };
+  api: {
+    url: string;
+    key: string;
+    agencyId?: string;
+  };
+  sync: SyncOptions;
+}
+
+const DEFAULT_BATCH_SIZE = 50_000;
+
+// SYNC_BATCH_SIZE must be a positive integer - anything else would make the batching loops
+// never advance, so fall back to the default instead
+function parseBatchSize(value: string | undefined): number {
+  if (!value) {
+    return DEFAULT_BATCH_SIZE;
+  }
+  const parsed = Number(value);
+  if (!Number.isInteger(parsed) || parsed <= 0) {
+    console.warn(`⚠️ Invalid SYNC_BATCH_SIZE "${value}", using ${DEFAULT_BATCH_SIZE}`);
+    return DEFAULT_BATCH_SIZE;
+  }
+  return parsed;
+}
+
+// Reads and validates all settings in a single pass over the environment.
+// Every process.env access goes through a native getter, so cron runs reuse these values
+// instead of looking them up each minute. Exits if a required variable is missing.
+function loadConfig(): Config {
+  const env = process.env;
+  const missing: string[] = [];
+  const required = (key: string): string => {
+    const value = env[key];
+    if (!value) {
+      missing.push(key);
+    }
+    return value ?? "";
+  };
+
+  const loaded: Config = {
+    db: {
+      host: required("DB_HOST"),
+      port: Number(required("DB_PORT")),
+      user: required("DB_USER"),
+      password: required("DB_PASSWORD"),
+      database: required("DB_NAME"),
+    },
+    api: {
+      url: required("TRANZY_API_URL"),
+      key: required("TRANZY_API_KEY"),
+      agencyId: env.TRANZY_AGENCY_ID || undefined,
+    },
+    sync: {
+      batchSize: parseBatchSize(env.SYNC_BATCH_SIZE),
+      incremental: env.SYNC_INCREMENTAL === "true",
+      aggressiveBulkMode: env.SYNC_AGGRESSIVE_BULK_MODE === "true",
+    },
+  };
 
-function validateEnvironment() {
-  const missing = requiredEnvVars.filter((key) => !process.env[key]);
   if (missing.length > 0) {
     console.error(`❌ Missing required environment variables: ${missing.join(", ")}`);
     process.exit(1);
   }
-  console.log("✅ All required environment variables are set");
+  return loaded;
 }
 
-async function createDbConnection() {
-  try {
-    const client = new Client({
-      host: process.env.DB_HOST,
-      port: Number(process.env.DB_PORT),
-      user: process.env.DB_USER,
-      password: process.env.DB_PASSWORD,
-      database: process.env.DB_NAME,
-    });
+// Validate environment variables before anything else runs
+const config = loadConfig();
+
+// How often the cron job runs
+const CRON_INTERVAL_MS = 60_000;
+
+// How long graceful shutdown waits for an in-flight run before exiting anyway
+const SHUTDOWN_TIMEOUT_MS = 5_000;
+
+// First delay between attempts to take the instance lock at startup; doubles up to CRON_INTERVAL_MS
+const LOCK_RETRY_INITIAL_DELAY_MS = 5_000;
+
+// How long the per-run check of the instance lock connection may take
+const LOCK_CHECK_TIMEOUT_MS = 10_000;
+
+// Reported to PostgreSQL as application_name on every connection, including this process's
+// PID, so pg_stat_activity shows which process holds the instance lock
+const APPLICATION_NAME = `public-transportation-analysis:${process.pid}`;
+
+// Vehicle metadata already written to the database, keyed by id. Lets each run
+// skip the upsert for vehicles whose label and type have not changed.
+const knownVehicles = new Map<string, { label: string; vehicle_type: string }>();
+
+// Raw API timestamp of the last state stored per vehicle (incremental mode only). A vehicle
+// reporting the same timestamp again has no new state, so it never reaches the database.
+const lastSeenTimestamps = new Map<string, string>();
+
+// Connection pool shared by all cron runs, so each run reuses an open connection
+// instead of paying the TCP + authentication handshake every minute. Created only
+// once the instance lock is held, so an instance that exits early never sets it up.
+let pool: Pool | null = null;
 
-    await client.connect();
-    console.log("✅ Connected to PostgreSQL");
-    return client;
+function createPool(): Pool {
+  const newPool = new Pool({
+    ...config.db,
+    application_name: APPLICATION_NAME,
+    // Keep idle connections open across runs
+    idleTimeoutMillis: 2 * CRON_INTERVAL_MS,
+    // Set as a startup parameter, so it costs no extra round trip per connection
+    options: config.sync.aggressiveBulkMode ? "-c synchronous_commit=off" : undefined,
+  });
+
+  newPool.on("connect", () => console.log("✅ Connected to PostgreSQL"));
+
+  // Errors on idle clients would otherwise crash the process; the pool discards the broken client
+  newPool.on("error", (err) => console.error("❌ Idle PostgreSQL client error:", err));
+
+  return newPool;
+}
+
+async function createDbConnection(): Promise<PoolClient> {
+  if (!pool) {
+    throw new Error("PostgreSQL connection pool has not been created");
+  }
+
+  try {
+    return await pool.connect();
   } catch (err) {
     console.error("❌ Failed to connect to PostgreSQL:", err);
     throw err;
   }
 }
 
-async function fetchFromApi(path: string, useAgency: boolean = false): Promise<Vehicle[]> {
-  if (!process.env.TRANZY_API_URL) {
-    console.error("❌ TRANZY_API_URL is missing!");
-    return [];
+// Name of the PostgreSQL advisory lock that allows only one instance of the job per database
+const INSTANCE_LOCK_NAME = "public-transportation-analysis";
+
+// Dedicated connection holding the instance lock for the lifetime of the process
+let lockClient: Client | null = null;
+
+// Diagnostic only: report which connection holds the instance lock. The lock itself is the
+// single source of truth; this just makes "already running" actionable in the logs.
+async function logInstanceLockHolder(client: Client) {
+  try {
+    // A bigint advisory key is stored in pg_locks split into classid (high 32 bits) and objid (low 32 bits)
+    const { rows } = await client.query(
+      `SELECT a.pid, a.application_name, a.client_addr, a.backend_start
+       FROM pg_locks l
+       JOIN pg_stat_activity a ON a.pid = l.pid
+       WHERE l.locktype = 'advisory' AND l.granted AND l.objsubid = 1
+         -- Advisory locks are per database, but pg_locks lists the whole cluster
+         AND l.database = (SELECT oid FROM pg_database WHERE datname = current_database())
+         AND l.classid::bigint = (hashtext($1)::bigint >> 32) & 4294967295
+         AND l.objid::bigint = hashtext($1)::bigint & 4294967295`,
+      [INSTANCE_LOCK_NAME]
+    );
+    for (const holder of rows) {
+      console.log(
+        `🔒 Instance lock held by backend ${holder.pid} (${holder.application_name || "unknown application"}` +
+          `${holder.client_addr ? ` from ${holder.client_addr}` : ""}, connected since ${holder.backend_start})`
+      );
+    }
+  } catch (err) {
+    console.error("❌ Could not look up the instance lock holder:", err);
   }
+}
 
-  const base = process.env.TRANZY_API_URL;
-  const url = path.startsWith("/") ? `${base}${path}` : `${base}/${path}`;
+// Try to become the only running instance. The advisory lock belongs to the session, so
+// PostgreSQL releases it as soon as this process exits or its connection drops - there is
+// no lock file or PID that can go stale and no liveness check to race against.
+async function acquireInstanceLock(reportHolder: boolean): Promise<boolean> {
+  // TCP keepalive detects a silently dropped connection (and thus a released lock) on idle networks.
+  // The OS default delay before the first probe is hours, so start probing after one cron interval.
+  // The query timeout bounds the per-run lock check below if the peer stops answering.
+  const client = new Client({
+    ...config.db,
+    application_name: APPLICATION_NAME,
+    keepAlive: true,
+    keepAliveInitialDelayMillis: CRON_INTERVAL_MS,
+    query_timeout: LOCK_CHECK_TIMEOUT_MS,
+  });
+  await client.connect();
 
-  console.log(`🌐 Fetching from API: ${url}`);
+  let locked: boolean;
+  try {
+    const { rows } = await client.query("SELECT pg_try_advisory_lock(hashtext($1)) AS locked", [
+      INSTANCE_LOCK_NAME,
+    ]);
+    locked = rows[0].locked;
+  } catch (err) {
+    await client.end().catch(() => undefined);
+    throw err;
+  }
 
-  const headers: Record<string, string> = {
-    "X-API-KEY": process.env.TRANZY_API_KEY ?? "",
-  };
+  if (!locked) {
+    if (reportHolder) {
+      await logInstanceLockHolder(client);
+    }
+    await client.end();
+    return false;
+  }
+
+  // Once the lock connection is lost, PostgreSQL has released the lock and another instance
+  // may take over - stop writing until the lock is taken again
+  client.on("error", (err) => handleLostInstanceLock(client, err));
+
+  lockClient = client;
+  return true;
+}
+
+// Take the instance lock, retrying with a backoff up to one cron interval while PostgreSQL
+// is unreachable or another instance holds the lock (e.g. during an overlapping deploy).
+// Resolves once the lock is held, or when the process is shutting down.
+async function waitForInstanceLock(): Promise<void> {
+  let retryDelayMs = LOCK_RETRY_INITIAL_DELAY_MS;
+  let reportedHolder = false;
+  while (!isShuttingDown) {
+    try {
+      if (await acquireInstanceLock(!reportedHolder)) {
+        return;
+      }
+      if (!reportedHolder) {
+        console.log("🔒 Another instance is already running, waiting for it to release the lock");
+        reportedHolder = true;
+      }
+    } catch (err) {
+      console.error(`❌ Could not take the instance lock, retrying in ${retryDelayMs / 1000} s:`, err);
+    }
+
+    await new Promise((resolve) => setTimeout(resolve, retryDelayMs));
+    retryDelayMs = Math.min(retryDelayMs * 2, CRON_INTERVAL_MS);
+  }
+}
+
+// Background attempt to take the lock again after it was lost, if one is running
+let lockReacquisition: Promise<void> | null = null;
+
+// The lock connection failed, so the lock is gone. Runs skip their writes while lockClient is
+// null, and the lock is retaken in the background - a database restart costs a few runs,
+// not the process.
+function handleLostInstanceLock(client: Client, err: unknown) {
+  // Errors from a connection that was already given up on
+  if (lockClient !== client) {
+    return;
+  }
+
+  console.error("❌ Lost instance lock connection:", err);
+  lockClient = null;
+  client.end().catch(() => undefined);
+
+  if (!lockReacquisition && !isShuttingDown) {
+    lockReacquisition = waitForInstanceLock()
+      .then(() => {
+        if (lockClient) {
+          console.log("🔒 Re-acquired instance lock");
+        }
+      })
+      .finally(() => {
+        lockReacquisition = null;
+      });
+  }
+}
+
+// Confirm the instance lock connection is still alive before a run writes anything. The
+// session lock is held for exactly as long as this connection lives, so if the check fails
+// another instance may already have taken over - skip the run instead of writing.
+async function checkInstanceLock(): Promise<boolean> {
+  const client = lockClient;
+  if (!client) {
+    return false;
+  }
 
-  if (useAgency && process.env.TRANZY_AGENCY_ID) {
-    headers["X-Agency-Id"] = process.env.TRANZY_AGENCY_ID;
-    console.log(`🔑 Using Agency ID: ${process.env.TRANZY_AGENCY_ID}`);
+  try {
+    await client.query("SELECT 1");
+    return true;
+  } catch (err) {
+    handleLostInstanceLock(client, err);
+    return false;
   }
+}
+
+// Joins an API path onto the configured base URL
+function apiUrl(path: string): string {
+  const base = config.api.url;
+  return path.startsWith("/") ? `${base}${path}` : `${base}/${path}`;
+}
+
+// The vehicles endpoint never changes, so its URL is built once at startup
+const VEHICLES_URL = apiUrl("/vehicles");
+
+// API request headers are fixed for the lifetime of the process, so build them once
+const apiHeaders: Record<string, string> = {
+  "X-API-KEY": config.api.key,
+};
+const apiAgencyHeaders: Record<string, string> = config.api.agencyId
+  ? { ...apiHeaders, "X-Agency-Id": config.api.agencyId }
+  : apiHeaders;
+
+// Returns null if the request failed, so callers can tell a failure from an empty vehicle list
+async function fetchFromApi(url: string, useAgency: boolean = false): Promise<Vehicle[] | null> {
+  const headers = useAgency ? apiAgencyHeaders : apiHeaders;
 
   try {
     const res = await fetch(url, { headers });
     if (!res.ok) {
-      console.error(`API returned error ${res.status}`);
-      return [];
+      console.error(`API returned error ${res.status} for ${url}`);
+      return null;
     }
     const data = await res.json() as Vehicle[];
-    console.log(`✅ Fetched ${Array.isArray(data) ? data.length : 1} vehicles`);
-    return Array.isArray(data) ? data : [];
+    if (!Array.isArray(data)) {
+      console.error(`❌ API returned an unexpected response for ${url}`);
+      return null;
+    }
+    return data;
   } catch (err) {
     console.error("❌ Fetch error:", err);
-    return [];
+    return null;
+  }
+}
+
+// Zone for API timestamps without an offset. Resolved once here rather than from
+// the zone name string on every parse.
+const API_TIME_ZONE = IANAZone.create("Europe/Bucharest");
+
+// Accessibility values reported by the API
+const BIKE_ACCESSIBLE = "BIKE_ACCESSIBLE";
+const WHEELCHAIR_ACCESSIBLE = "WHEELCHAIR_ACCESSIBLE";
+
+// Matches the "yyyy-MM-dd HH:mm:ss" API timestamp format in a single pass,
+// avoiding luxon's per-call format-string tokenization in DateTime.fromFormat
+const LOCAL_TIMESTAMP_RE = /^(\d{4})-(\d{2})-(\d{2}) (\d{2}):(\d{2}):(\d{2})$/;
+
+// Parse timestamp from API - handle both ISO format and "yyyy-MM-dd HH:mm:ss" format.
+// Returns null if the timestamp is invalid.
+function parseTimestamp(value: string): Date | null {
+  // The "yyyy-MM-dd HH:mm:ss" format is never valid ISO (no "T"), so check it first
+  // (assumes Europe/Bucharest timezone)
+  const m = LOCAL_TIMESTAMP_RE.exec(value);
+
+  // Otherwise expect ISO format (e.g., "2025-11-22T14:15:20.000Z"). An ISO timestamp already
+  // identifies an instant, so converting it to Europe/Bucharest would not change the resulting Date.
+  const ts = m
+    ? DateTime.fromObject(
+        {
+          year: Number(m[1]),
+          month: Number(m[2]),
+          day: Number(m[3]),
+          hour: Number(m[4]),
+          minute: Number(m[5]),
+          second: Number(m[6]),
+        },
+        { zone: API_TIME_ZONE }
+      )
+    : DateTime.fromISO(value);
+
+  return ts.isValid ? ts.toJSDate() : null;
+}
+
+// SQL is built once at startup and run as named prepared statements, so PostgreSQL
+// parses and plans each statement once per pooled connection rather than once per batch
+const UPSERT_VEHICLES_SQL = `INSERT INTO vehicle (id, label, vehicle_type)
+  SELECT * FROM unnest($1::varchar[], $2::varchar[], $3::varchar[])
+  ON CONFLICT (id) DO UPDATE SET
+    label = EXCLUDED.label,
+    vehicle_type = EXCLUDED.vehicle_type
+  -- Skip the write (and the dead tuple it leaves behind) when nothing changed
+  WHERE (vehicle.label, vehicle.vehicle_type) IS DISTINCT FROM (EXCLUDED.label, EXCLUDED.vehicle_type)`;
+
+// In incremental mode the "already stored?" check runs inside PostgreSQL (using the
+// (vehicle_id, timestamp) index), instead of re-inserting unchanged positions every run
+const INSERT_VEHICLE_STATES_SQL = `INSERT INTO vehicle_state (vehicle_id, latitude, longitude, timestamp, speed, bike_accessible, wheelchair_accessible)
+  SELECT u.* FROM unnest($1::varchar[], $2::decimal[], $3::decimal[], $4::timestamp[], $5::decimal[], $6::boolean[], $7::boolean[])
+    AS u(vehicle_id, latitude, longitude, timestamp, speed, bike_accessible, wheelchair_accessible)
+  ${config.sync.incremental ? `WHERE NOT EXISTS (
+    SELECT 1 FROM vehicle_state s
+    WHERE s.vehicle_id = u.vehicle_id AND s.timestamp >= u.timestamp
+  )` : ""}`;
+
+// Split items into consecutive batches of at most `size` elements
+function* chunks<T>(items: T[], size: number): Generator<T[]> {
+  for (let i = 0; i < items.length; i += size) {
+    yield items.slice(i, i + size);
   }
 }
 
 async function runCronJob() {
-  let client: Client | null = null;
+  let client: PoolClient | null = null;
+  // Monotonic clock for the run duration - unaffected by wall-clock adjustments
+  const startedAt = performance.now();
+  const elapsedMs = () => Math.round(performance.now() - startedAt);
   
   try {
-    client = await createDbConnection();
-    console.log(`⏱ Cron job started at ${new Date().toISOString()}`);
-    
-    const vehicles = await fetchFromApi("/vehicles", true);
+    if (!(await checkInstanceLock())) {
+      console.warn("⏸️  Instance lock not held, skipping this run");
+      return;
+    }
 
+    // Connect to the database while the API request is in flight - the two are independent
+    const [dbClient, vehicles] = await Promise.all([
+      createDbConnection(),
+      fetchFromApi(VEHICLES_URL, true),
+    ]);
+    client = dbClient;
+
+    if (!vehicles) {
+      console.error(`⚠️ Cron job aborted after ${elapsedMs()} ms: could not fetch vehicles from the API`);
+      return;
+    }
+
+    // Deduplicate by id (last one wins) - ON CONFLICT cannot touch the same row twice in one statement
+    const vehicleRows = new Map<string, Vehicle>();
     for (const v of vehicles) {
-      const bike = v.bike_accessible === "BIKE_ACCESSIBLE";
-      const wheelchair = v.wheelchair_accessible === "WHEELCHAIR_ACCESSIBLE";
-
-      // Upsert vehicle
-      await client.query(
-        `INSERT INTO vehicle (id, label, vehicle_type)
-         VALUES ($1,$2,$3)
-         ON CONFLICT (id) DO UPDATE SET
-           label = EXCLUDED.label,
-           vehicle_type = EXCLUDED.vehicle_type`,
-        [v.id, v.label, v.vehicle_type]
-      );
+      vehicleRows.set(v.id, v);
+    }
 
-      // Parse timestamp from API - handle both ISO format and "yyyy-MM-dd HH:mm:ss" format
-      let ts: DateTime;
-      
-      // Try ISO format first (e.g., "2025-11-22T14:15:20.000Z")
-      ts = DateTime.fromISO(v.timestamp);
-      
-      // If ISO parsing fails, try the original format (assumes Europe/Bucharest timezone)
-      if (!ts.isValid) {
-        ts = DateTime.fromFormat(v.timestamp, "yyyy-MM-dd HH:mm:ss", {
-          zone: "Europe/Bucharest",
-        });
-      } else {
-        // Convert ISO timestamp to Europe/Bucharest timezone if it has timezone info
-        if (ts.zoneName !== "Europe/Bucharest") {
-          ts = ts.setZone("Europe/Bucharest");
+    // Only upsert vehicles that are new or whose metadata changed since the last run
+    const changedVehicles = [...vehicleRows.values()].filter((v) => {
+      const known = knownVehicles.get(v.id);
+      return !known || known.label !== v.label || known.vehicle_type !== v.vehicle_type;
+    });
+
+    // In incremental mode, drop vehicles that have not reported since the last run
+    const pendingStates = config.sync.incremental
+      ? vehicles.filter((v) => lastSeenTimestamps.get(v.id) !== v.timestamp)
+      : vehicles;
+
+    if (changedVehicles.length === 0 && pendingStates.length === 0) {
+      console.log(`💤 Fetched ${vehicles.length} vehicles in ${elapsedMs()} ms, no changes since the last run`);
+      return;
+    }
+
+    // Upsert vehicles in batches of config.sync.batchSize (one round trip per batch instead of one per vehicle)
+    for (const batch of chunks(changedVehicles, config.sync.batchSize)) {
+      await client.query({
+        name: "upsert-vehicles",
+        text: UPSERT_VEHICLES_SQL,
+        values: [batch.map((v) => v.id), batch.map((v) => v.label), batch.map((v) => v.vehicle_type)],
+      });
+      for (const v of batch) {
+        knownVehicles.set(v.id, { label: v.label, vehicle_type: v.vehicle_type });
+      }
+    }
+
+    // Convert and insert vehicle states one batch at a time, so only a single batch
+    // of converted rows is alive at once and the first write starts sooner
+    let storedStates = 0;
+    let invalidTimestamps = 0;
+    let firstInvalid: Vehicle | null = null;
+    for (const batch of chunks(pendingStates, config.sync.batchSize)) {
+      // Fill the column arrays directly - no per-row object or per-column copy
+      const states: VehicleStateColumns = {
+        vehicle_id: [],
+        latitude: [],
+        longitude: [],
+        timestamp: [],
+        speed: [],
+        bike_accessible: [],
+        wheelchair_accessible: [],
+      };
+      for (const v of batch) {
+        const timestamp = parseTimestamp(v.timestamp);
+        if (!timestamp) {
+          // Counted here and reported once after the loop, keeping logging out of the per-row path
+          if (invalidTimestamps++ === 0) {
+            firstInvalid = v;
+          }
+          continue;
         }
+
+        states.vehicle_id.push(v.id);
+        states.latitude.push(v.latitude);
+        states.longitude.push(v.longitude);
+        states.timestamp.push(timestamp);
+        states.speed.push(v.speed ?? 0);
+        states.bike_accessible.push(v.bike_accessible === BIKE_ACCESSIBLE);
+        states.wheelchair_accessible.push(v.wheelchair_accessible === WHEELCHAIR_ACCESSIBLE);
       }
-      
-      if (!ts.isValid) {
-        console.error("❌ Invalid timestamp for vehicle", v.id, v.timestamp);
-        continue;
+
+      if (states.vehicle_id.length > 0) {
+        const result = await client.query({
+          name: "insert-vehicle-states",
+          text: INSERT_VEHICLE_STATES_SQL,
+          values: [
+            states.vehicle_id,
+            states.latitude,
+            states.longitude,
+            states.timestamp,
+            states.speed,
+            states.bike_accessible,
+            states.wheelchair_accessible,
+          ],
+        });
+        storedStates += result.rowCount ?? 0;
       }
-      const parsedTimestamp = ts.toJSDate();
 
-      // Insert vehicle state
-      await client.query(
-        `INSERT INTO vehicle_state (vehicle_id, latitude, longitude, timestamp, speed, bike_accessible, wheelchair_accessible)
-         VALUES ($1,$2,$3,$4,$5,$6,$7)`,
-        [v.id, v.latitude, v.longitude, parsedTimestamp, v.speed ?? 0, bike, wheelchair]
+      if (config.sync.incremental) {
+        for (const v of batch) {
+          lastSeenTimestamps.set(v.id, v.timestamp);
+        }
+      }
+    }
+
+    if (firstInvalid) {
+      console.error(
+        `❌ Skipped ${invalidTimestamps} vehicle states with invalid timestamps (first: vehicle ${firstInvalid.id}, ${firstInvalid.timestamp})`
       );
     }
 
-    console.log(`✅ Cron job completed at ${new Date().toISOString()}`);
+    // One summary line per run instead of a line per step
+    console.log(
+      `✅ Cron job completed at ${new Date().toISOString()} in ${elapsedMs()} ms: ` +
+        `fetched ${vehicles.length} vehicles, stored ${changedVehicles.length} new/changed vehicles ` +
+        `and ${storedStates} vehicle states`
+    );
 
   } catch (err) {
-    console.error("⚠️ Cron job error", err);
+    console.error(`⚠️ Cron job error after ${elapsedMs()} ms`, err);
+    // The database may no longer match the caches (e.g. a vehicle row was removed), so resync everything next run
+    knownVehicles.clear();
+    lastSeenTimestamps.clear();
   } finally {
     if (client) {
-      await client.end();
-      console.log("🔒 PostgreSQL connection closed");
+      client.release();
     }
   }
 }
 
+// The cron run currently in flight, if any. Runs never overlap: a tick that fires while
+// the previous run is still writing is skipped instead of queueing up behind it.
+let currentRun: Promise<void> | null = null;
+
+function scheduleCronJob() {
+  if (currentRun) {
+    console.warn("⏭️  Previous cron job still running, skipping this tick");
+    return;
+  }
+  currentRun = runCronJob().finally(() => {
+    currentRun = null;
+  });
+}
+
 // Graceful shutdown handling
 let intervalId: NodeJS.Timeout | null = null;
 let isShuttingDown = false;
 
-async function gracefulShutdown(signal: string) {
+async function gracefulShutdown(signal: string, exitCode: number = 0) {
   if (isShuttingDown) {
     return;
   }
@@ -171,23 +597,81 @@ async function gracefulShutdown(signal: string) {
   
   if (intervalId) {
     clearInterval(intervalId);
-    console.log("⏸️  Stopped cron job interval");
   }
   
   // Wait for any running cron job to complete (with timeout)
-  await new Promise((resolve) => setTimeout(resolve, 5000));
-  
-  console.log("👋 Shutdown complete");
-  process.exit(0);
+  let runFinished = true;
+  if (currentRun) {
+    console.log("⏳ Waiting for the running cron job to finish...");
+    runFinished = await Promise.race([
+      currentRun.then(() => true, () => true),
+      new Promise<boolean>((resolve) => setTimeout(() => resolve(false), SHUTDOWN_TIMEOUT_MS)),
+    ]);
+    if (!runFinished) {
+      console.warn(`⚠️ Cron job still running after ${SHUTDOWN_TIMEOUT_MS} ms, exiting without waiting for it`);
+    }
+  }
+
+  // Teardown errors must not bypass process.exit - the unhandledRejection handler would
+  // just return because a shutdown is already in progress, leaving the process hanging
+  try {
+    // pool.end() only resolves once every checked-out client is released, so it would wait
+    // for a run that already exceeded the timeout - skip it and let process exit close the sockets
+    if (pool && runFinished) {
+      await pool.end();
+      console.log("🔒 PostgreSQL connection pool closed");
+    }
+
+    if (lockClient) {
+      await lockClient.end();
+      console.log("🔓 Released instance lock");
+    }
+
+    console.log("👋 Shutdown complete");
+  } catch (err) {
+    console.error("❌ Error during shutdown:", err);
+    exitCode = 1;
+  } finally {
+    process.exit(exitCode);
+  }
 }
 
 // Setup signal handlers
 process.on("SIGTERM", () => gracefulShutdown("SIGTERM"));
 process.on("SIGINT", () => gracefulShutdown("SIGINT"));
 
-// Validate environment variables before starting
-validateEnvironment();
+// Unexpected errors go through the same shutdown path, so the in-flight run gets a chance to
+// finish and the pool and instance lock connection are closed instead of dropped mid-write
+process.on("uncaughtException", (err) => {
+  console.error("❌ Uncaught exception:", err);
+  gracefulShutdown("uncaughtException", 1);
+});
+process.on("unhandledRejection", (reason) => {
+  console.error("❌ Unhandled promise rejection:", reason);
+  gracefulShutdown("unhandledRejection", 1);
+});
+
+async function main() {
+  // Keep retrying while PostgreSQL is unreachable, so a database that is down at startup
+  // does not stop the job
+  await waitForInstanceLock();
+  if (isShuttingDown) {
+    return;
+  }
+
+  console.log(
+    `🔒 Acquired instance lock, polling ${VEHICLES_URL} every ${CRON_INTERVAL_MS / 1000} s` +
+      (config.api.agencyId ? ` (Agency ID: ${config.api.agencyId})` : "")
+  );
+
+  pool = createPool();
+
+  // Run once every CRON_INTERVAL_MS using setInterval
+  intervalId = setInterval(scheduleCronJob, CRON_INTERVAL_MS);
+  scheduleCronJob(); // run immediately once
+}
 
-// Run once every minute using setInterval
-intervalId = setInterval(runCronJob, 60_000);
-runCronJob(); // run immediately once
+main().catch((err) => {
+  console.error("❌ Startup failed:", err);
+  process.exit(1);
+});
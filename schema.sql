@@ -18,8 +18,16 @@ CREATE TABLE IF NOT EXISTS vehicle_state (
   wheelchair_accessible BOOLEAN
 );
 
--- Create index on vehicle_id for faster lookups
-CREATE INDEX IF NOT EXISTS idx_vehicle_state_vehicle_id ON vehicle_state(vehicle_id);
+-- Create index on (vehicle_id, timestamp) for per-vehicle lookups and latest-state checks.
+-- It also serves plain vehicle_id lookups, so the old single-column index is dropped
+-- to avoid maintaining a redundant index on every insert.
+-- On existing databases this is a migration step: both statements run CONCURRENTLY so the
+-- running job's inserts are not blocked while the index is built on a large table. They
+-- cannot run inside a transaction, so apply this file with plain `psql -f` (not
+-- --single-transaction). If the build is interrupted, drop the INVALID index it leaves
+-- behind and re-run this file.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_vehicle_state_vehicle_id_timestamp ON vehicle_state(vehicle_id, timestamp);
+DROP INDEX CONCURRENTLY IF EXISTS idx_vehicle_state_vehicle_id;
 
 -- Create index on timestamp for time-based queries
 CREATE INDEX IF NOT EXISTS idx_vehicle_state_timestamp ON vehicle_state(timestamp);